@@ -11,15 +11,30 @@ Usage:
 
 If the transcript has `raw.utterances` it will be used. Otherwise it will attempt
 to group contiguous `raw.words` entries with the same speaker.
+
+Transcripts may be plain JSON or zstd-compressed (`.json.zst`).
 """
 import argparse
-import json
 import os
 import sys
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+import orjson
+import zstandard as zstd
+
+
+def decode_transcript(data, compressed=False):
+    """Parse transcript bytes, decompressing them first if they are zstd-compressed."""
+    if compressed:
+        data = zstd.ZstdDecompressor().decompress(data)
+    return orjson.loads(data)
+
 
 def load_transcript(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(path, 'rb') as f:
+        return decode_transcript(f.read(), str(path).endswith('.zst'))
 
 
 def build_segments_from_utterances(raw):
@@ -36,35 +51,34 @@ def build_segments_from_utterances(raw):
     return segments
 
 
+# below this many words the plain Python sort beats NumPy's conversion overhead
+NUMPY_SORT_MIN_WORDS = 512
+
+
+def sort_words_by_start(words):
+    """Return `words` ordered by 'start' (stable, missing start sorts as 0)."""
+    if len(words) < NUMPY_SORT_MIN_WORDS:
+        return sorted(words, key=lambda x: x.get('start', 0))
+    starts = np.fromiter((w.get('start', 0) for w in words), dtype=np.float64, count=len(words))
+    order = np.argsort(starts, kind='stable')
+    return [words[i] for i in order.tolist()]
+
+
 def build_segments_from_words(raw):
     words = raw.get('words') or []
     if not words:
         return []
-    # Group contiguous words with same speaker
+    # Group contiguous words with same speaker: normalize each word to a
+    # (speaker, text, start, end) tuple once, then let groupby find the runs
+    words_sorted = sort_words_by_start(words)
+    tuples = [
+        (w.get('speaker') or w.get('speaker_label') or 'UNKNOWN', w.get('text', ''), w.get('start'), w.get('end'))
+        for w in words_sorted
+    ]
     segments = []
-    cur_speaker = None
-    cur_words = []
-    cur_start = None
-    cur_end = None
-    for w in sorted(words, key=lambda x: x.get('start', 0)):
-        sp = w.get('speaker') or w.get('speaker_label') or 'UNKNOWN'
-        if cur_speaker is None:
-            cur_speaker = sp
-            cur_words = [w.get('text','')]
-            cur_start = w.get('start')
-            cur_end = w.get('end')
-        elif sp == cur_speaker:
-            cur_words.append(w.get('text',''))
-            cur_end = w.get('end')
-        else:
-            segments.append({'speaker': cur_speaker, 'text': ' '.join(cur_words), 'start': cur_start, 'end': cur_end})
-            cur_speaker = sp
-            cur_words = [w.get('text','')]
-            cur_start = w.get('start')
-            cur_end = w.get('end')
-    # final
-    if cur_speaker is not None:
-        segments.append({'speaker': cur_speaker, 'text': ' '.join(cur_words), 'start': cur_start, 'end': cur_end})
+    for sp, group in groupby(tuples, key=itemgetter(0)):
+        g = list(group)
+        segments.append({'speaker': sp, 'text': ' '.join(map(itemgetter(1), g)), 'start': g[0][2], 'end': g[-1][3]})
     return segments
 
 
@@ -72,57 +86,80 @@ def build_segments_from_words(raw):
 # `segments` structure preserves conversational turns and order.
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('transcript', help='Path to transcript JSON (transcripts/{id}.json)')
-    parser.add_argument('--out', '-o', help='Output path (JSON). If omitted prints to stdout')
-    parser.add_argument('--mode', choices=['both','list','per_speaker'], default='both')
-    args = parser.parse_args()
+def normalize_label(lab):
+    """Normalize speaker labels to short form ("Speaker 0" -> "A", "B"...), keeping A, B etc. as is."""
+    if not isinstance(lab, str):
+        return str(lab)
+    lab = lab.strip()
+    if lab.lower().startswith('speaker'):
+        try:
+            n = int(''.join(ch for ch in lab if ch.isdigit()))
+            # map 0->A,1->B ...
+            return chr(ord('A') + n)
+        except Exception:
+            return lab
+    # keep single-letter labels
+    if len(lab) == 1:
+        return lab
+    return lab
+
+
+# bump whenever build_conversation's output changes; it keys the reconstruction cache
+# in run_reconstruct_all.py so stale cached conversations are not served
+RECONSTRUCT_FORMAT_VERSION = 1
 
-    if not os.path.exists(args.transcript):
-        print('Transcript file not found:', args.transcript, file=sys.stderr)
-        sys.exit(2)
 
-    obj = load_transcript(args.transcript)
+def build_conversation(obj, source):
+    """Build the output object ({'source', 'segments'}) from a loaded transcript."""
     raw = obj.get('raw', {}) if isinstance(obj, dict) else {}
 
     segments = build_segments_from_utterances(raw)
     if not segments:
         segments = build_segments_from_words(raw)
 
-    # normalize speaker labels to short form if they come like "Speaker 0" -> "A","B"...
-    # but keep them if already A,B etc.
-    def normalize_label(lab):
-        if not isinstance(lab, str):
-            return str(lab)
-        lab = lab.strip()
-        if lab.lower().startswith('speaker'):
-            try:
-                n = int(''.join(ch for ch in lab if ch.isdigit()))
-                # map 0->A,1->B ...
-                return chr(ord('A') + n)
-            except Exception:
-                return lab
-        # keep single-letter labels
-        if len(lab) == 1:
-            return lab
-        return lab
-
+    # only a handful of distinct labels occur, so normalize each one once
+    mapping = {lab: normalize_label(lab) for lab in {s['speaker'] for s in segments}}
     for s in segments:
-        s['speaker'] = normalize_label(s['speaker'])
+        s['speaker'] = mapping[s['speaker']]
         s['text'] = s['text'].strip()
 
-    out_obj = {
-        'source': args.transcript,
-        'segments': [{'speaker': seg['speaker'], 'text': seg['text'], 'start': seg.get('start'), 'end': seg.get('end')} for seg in segments],
-    }
+    # both builders already emit {'speaker', 'text', 'start', 'end'} dicts, so no copy is needed
+    return {'source': source, 'segments': segments}
+
+
+def write_out(path, out_obj):
+    with open(path, 'wb') as f:
+        f.write(orjson.dumps(out_obj, option=orjson.OPT_INDENT_2))
+
+
+def reconstruct(raw_path, out_path=None):
+    """Reconstruct the conversation for `raw_path`, writing it to `out_path` if given.
+
+    Library entry point used by `run_reconstruct_all.py`; returns the output object.
+    """
+    out_obj = build_conversation(load_transcript(raw_path), str(raw_path))
+    if out_path:
+        write_out(out_path, out_obj)
+    return out_obj
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('transcript', help='Path to transcript JSON (transcripts/{id}.json)')
+    parser.add_argument('--out', '-o', help='Output path (JSON). If omitted prints to stdout')
+    parser.add_argument('--mode', choices=['both','list','per_speaker'], default='both')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.transcript):
+        print('Transcript file not found:', args.transcript, file=sys.stderr)
+        sys.exit(2)
+
+    out_obj = reconstruct(args.transcript, args.out)
 
     if args.out:
-        with open(args.out, 'w', encoding='utf-8') as f:
-            json.dump(out_obj, f, ensure_ascii=False, indent=2)
         print('Wrote', args.out)
     else:
-        print(json.dumps(out_obj, ensure_ascii=False, indent=2))
+        print(orjson.dumps(out_obj, option=orjson.OPT_INDENT_2).decode('utf-8'))
 
 if __name__ == '__main__':
     main()
@@ -3,78 +3,189 @@
 Run the reconstruct_diarization script across all transcripts referenced in `transcripts/index.json`.
 
 This script is separate from the transcription flow: run it after `transcribe_videos.py` completes.
+Reconstruction runs in-process, no Python interpreter is spawned per transcript: an asyncio
+loop overlaps file reads/writes across transcripts in threads, while parsing and segment
+building run on a process pool (one worker per CPU). Results are cached by a hash of the raw
+transcript bytes and the reconstruction format version (see CACHE_DIR), so identical raw files
+are never reconstructed twice.
 """
-import json
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import subprocess
 import logging
 import sys
 
+import orjson
+
+from reconstruct_diarization import RECONSTRUCT_FORMAT_VERSION, build_conversation, decode_transcript, write_out
+
 ROOT = Path(__file__).resolve().parent.parent
 TRANS_DIR = ROOT / "transcripts"
 INDEX = TRANS_DIR / "index.json"
-RECON = ROOT / "scripts" / "reconstruct_diarization.py"
+# content-addressed cache of reconstructed conversations: v<format version>/<blake2b of raw bytes>.json
+CACHE_DIR = Path(os.getenv("RECONSTRUCT_CACHE_DIR", str(Path.home() / ".cache" / "starter_story" / "reconstruct")))
+# raw transcripts are written zstd-compressed; plain JSON ones from older runs are still read
+RAW_SUFFIXES = ("_raw.json.zst", "_raw.json")
+# transcripts in flight at once (bounds how many raw files are held in memory)
+RECONSTRUCT_CONCURRENCY = int(os.getenv("RECONSTRUCT_CONCURRENCY", str(2 * (os.cpu_count() or 1))))
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
-if not INDEX.exists():
-    logging.error("Index file not found: %s", INDEX)
-    sys.exit(2)
-
-with open(INDEX) as f:
-    index = json.load(f)
-
-for key, entry in index.items():
-    raw_file = None
-    conv_file = None
-    if entry.get('transcript_path'):
-        tpath = Path(entry['transcript_path'])
-        raw_file = tpath / f"{tpath.name}_raw.json"
-        conv_file = tpath / f"{tpath.name}_conversation.json"
-    elif entry.get('transcript_files') and entry['transcript_files'].get('raw'):
-        raw_file = Path(entry['transcript_files'].get('raw'))
-        conv_file = Path(entry['transcript_files'].get('conversation') or str(raw_file.with_name(f"{raw_file.stem}_conversation.json")))
-        # if raw_file lives directly under TRANS_DIR as <key>_raw.json, move it into a per-video dir
+
+def _raw_key(path):
+    """Return the video key of a `<key>_raw.json[.zst]` path, or None."""
+    for suffix in RAW_SUFFIXES:
+        if path.name.endswith(suffix):
+            return path.name[: -len(suffix)]
+    return None
+
+
+def _cache_path(raw_hash):
+    # the format version keeps caches from older reconstruction code from being reused
+    return CACHE_DIR / f"v{RECONSTRUCT_FORMAT_VERSION}" / f"{raw_hash}.json"
+
+
+def _write_from_cache(cache_file, raw_file, conv_file):
+    out_obj = orjson.loads(cache_file.read_bytes())
+    # the cached conversation may come from a copy of the raw file elsewhere
+    out_obj['source'] = str(raw_file)
+    write_out(conv_file, out_obj)
+
+
+def _read_and_hash(raw_file):
+    raw_bytes = raw_file.read_bytes()
+    return raw_bytes, hashlib.blake2b(raw_bytes, digest_size=16).hexdigest()
+
+
+def _build(raw_bytes, compressed, source):
+    """Process pool worker: parse raw transcript bytes into the conversation object."""
+    return build_conversation(decode_transcript(raw_bytes, compressed), source)
+
+
+def _write_result(key, conv_file, cache_file, out_obj):
+    write_out(conv_file, out_obj)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_suffix(f".{key}.tmp")
+    write_out(tmp, out_obj)
+    os.replace(tmp, cache_file)
+
+
+async def reconstruct_one(job, pool, sem):
+    """Reconstruct one `(key, raw_file, conv_file, known_hash)` job.
+
+    Serves the conversation from the cache when the raw bytes were seen before,
+    otherwise builds it on `pool` and stores it in the cache.
+    Returns `(key, raw_hash, error or None)`.
+    """
+    key, raw_file, conv_file, raw_hash = job
+    async with sem:
         try:
-            if raw_file.exists() and raw_file.parent.resolve() == TRANS_DIR.resolve() and raw_file.stem.endswith('_raw'):
-                expected_key = raw_file.stem[: -4]
-                if expected_key == key:
-                    vid_dir = TRANS_DIR / key
-                    vid_dir.mkdir(parents=True, exist_ok=True)
-                    new_raw = vid_dir / raw_file.name
-                    # move file
-                    raw_file.replace(new_raw)
-                    raw_file = new_raw
-                    conv_file = vid_dir / f"{key}_conversation.json"
-                    # update index entry to point to new directory
-                    entry['transcript_path'] = str(vid_dir)
-                    entry.setdefault('transcript_files', {})
-                    entry['transcript_files']['raw'] = str(raw_file)
-                    entry['transcript_files']['conversation'] = str(conv_file)
-                    with open(INDEX, 'w') as f:
-                        json.dump(index, f, indent=2)
-                    logging.info('Moved raw transcript into %s', vid_dir)
+            if raw_hash and _cache_path(raw_hash).exists():
+                await asyncio.to_thread(_write_from_cache, _cache_path(raw_hash), raw_file, conv_file)
+                return key, raw_hash, None
+            raw_bytes, raw_hash = await asyncio.to_thread(_read_and_hash, raw_file)
+            cache_file = _cache_path(raw_hash)
+            if cache_file.exists():
+                await asyncio.to_thread(_write_from_cache, cache_file, raw_file, conv_file)
+                return key, raw_hash, None
+            loop = asyncio.get_running_loop()
+            out_obj = await loop.run_in_executor(pool, _build, raw_bytes, raw_file.name.endswith('.zst'), str(raw_file))
+            await asyncio.to_thread(_write_result, key, conv_file, cache_file, out_obj)
+            return key, raw_hash, None
         except Exception as exc:
-            logging.warning('Failed to move raw file for %s: %s', key, exc)
-    elif entry.get('transcript_file'):
-        raw_file = Path(entry['transcript_file'])
-        conv_file = raw_file.with_name(f"{raw_file.stem}_conversation.json")
-    else:
-        logging.debug("No transcript info for %s - skipping", key)
-        continue
-
-    if not raw_file.exists():
-        logging.debug("Raw transcript missing for %s: %s", key, raw_file)
-        continue
-
-    if conv_file.exists():
-        logging.info("Conversation already exists for %s: %s", key, conv_file)
-        continue
-
-    logging.info("Reconstructing %s -> %s", raw_file, conv_file)
-    try:
-        subprocess.run([sys.executable, str(RECON), str(raw_file), "--out", str(conv_file)], check=True)
-    except Exception as exc:
-        logging.warning("Failed to reconstruct for %s: %s", key, exc)
-
-print("Done")
+            return key, raw_hash, str(exc)
+
+
+async def reconstruct_all(jobs):
+    sem = asyncio.Semaphore(RECONSTRUCT_CONCURRENCY)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        return await asyncio.gather(*[reconstruct_one(job, pool, sem) for job in jobs])
+
+
+def main():
+    if not INDEX.exists():
+        logging.error("Index file not found: %s", INDEX)
+        sys.exit(2)
+
+    with open(INDEX, 'rb') as f:
+        index = orjson.loads(f.read())
+
+    # collect the work first (this may move raw files and rewrite the index), then fan out
+    pairs = []
+    mtimes = {}
+    for key, entry in index.items():
+        raw_file = None
+        conv_file = None
+        if entry.get('transcript_path'):
+            tpath = Path(entry['transcript_path'])
+            raw_file = tpath / f"{tpath.name}_raw.json.zst"
+            if not raw_file.exists():
+                raw_file = tpath / f"{tpath.name}_raw.json"
+            conv_file = tpath / f"{tpath.name}_conversation.json"
+        elif entry.get('transcript_files') and entry['transcript_files'].get('raw'):
+            raw_file = Path(entry['transcript_files'].get('raw'))
+            conv_file = Path(entry['transcript_files'].get('conversation') or str(raw_file.with_name(f"{_raw_key(raw_file) or raw_file.stem}_conversation.json")))
+            # if raw_file lives directly under TRANS_DIR as <key>_raw.json[.zst], move it into a per-video dir
+            try:
+                if raw_file.exists() and raw_file.parent.resolve() == TRANS_DIR.resolve() and _raw_key(raw_file):
+                    expected_key = _raw_key(raw_file)
+                    if expected_key == key:
+                        vid_dir = TRANS_DIR / key
+                        vid_dir.mkdir(parents=True, exist_ok=True)
+                        new_raw = vid_dir / raw_file.name
+                        # move file
+                        raw_file.replace(new_raw)
+                        raw_file = new_raw
+                        conv_file = vid_dir / f"{key}_conversation.json"
+                        # update index entry to point to new directory
+                        entry['transcript_path'] = str(vid_dir)
+                        entry.setdefault('transcript_files', {})
+                        entry['transcript_files']['raw'] = str(raw_file)
+                        entry['transcript_files']['conversation'] = str(conv_file)
+                        with open(INDEX, 'wb') as f:
+                            f.write(orjson.dumps(index, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+                        logging.info('Moved raw transcript into %s', vid_dir)
+            except Exception as exc:
+                logging.warning('Failed to move raw file for %s: %s', key, exc)
+        elif entry.get('transcript_file'):
+            raw_file = Path(entry['transcript_file'])
+            conv_file = raw_file.with_name(f"{raw_file.stem}_conversation.json")
+        else:
+            logging.debug("No transcript info for %s - skipping", key)
+            continue
+
+        if not raw_file.exists():
+            logging.debug("Raw transcript missing for %s: %s", key, raw_file)
+            continue
+
+        if conv_file.exists():
+            logging.info("Conversation already exists for %s: %s", key, conv_file)
+            continue
+
+        # a stored hash is only trusted while the raw file is unchanged since it was computed
+        tfiles = entry.get('transcript_files') or {}
+        mtime = raw_file.stat().st_mtime_ns
+        known_hash = tfiles.get('raw_hash') if tfiles.get('raw_mtime_ns') == mtime else None
+
+        logging.info("Reconstructing %s -> %s", raw_file, conv_file)
+        pairs.append((key, raw_file, conv_file, known_hash))
+        mtimes[key] = mtime
+
+    if pairs:
+        for key, raw_hash, err in asyncio.run(reconstruct_all(pairs)):
+            if err:
+                logging.warning("Failed to reconstruct for %s: %s", key, err)
+            if raw_hash:
+                tfiles = index[key].setdefault('transcript_files', {})
+                tfiles['raw_hash'] = raw_hash
+                tfiles['raw_mtime_ns'] = mtimes[key]
+        with open(INDEX, 'wb') as f:
+            f.write(orjson.dumps(index, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+
+    print("Done")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,22 @@ Simple scaffold to download YouTube audio and transcribe with AssemblyAI Python
 Usage: set `ASSEMBLYAI_API_KEY` in env, put YouTube URLs in `videos_list.json`, then run.
 """
 import os
-import json
+import asyncio
+import atexit
+import functools
 import subprocess
 import logging
 import shutil
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs
 from pathlib import Path
 from dotenv import load_dotenv
-import requests
-import time
+import aiohttp
+import orjson
+import zstandard as zstd
 from tqdm import tqdm
 from datetime import datetime
 
@@ -24,17 +31,30 @@ OUT_DIR = ROOT / "transcripts"
 DOWNLOAD_DIR.mkdir(exist_ok=True)
 OUT_DIR.mkdir(exist_ok=True)
 INDEX_PATH = OUT_DIR / "index.json"
+# minimum seconds between non-forced index writes (status checkpoints are debounced)
+INDEX_FLUSH_INTERVAL = float(os.getenv("INDEX_FLUSH_INTERVAL", "2"))
+_last_index_flush = 0.0
+# pending trailing write (asyncio.TimerHandle) for a debounced flush
+_index_flush_timer = None
 
 # retries/backoff config
 DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
 UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "3"))
 RETRY_BACKOFF = float(os.getenv("RETRY_BACKOFF", "2"))
+# HTTP statuses treated as transient (rate limiting / gateway errors)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# max pooled connections to the AssemblyAI API shared by all concurrent videos
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
 
 # limit processed videos (useful for testing channels)
 MAX_VIDEOS = int(os.getenv("MAX_VIDEOS", "0"))  # 0 = no limit
 
-# audio format to request from yt-dlp (use compressed by default to save upload time/cost)
-AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "mp3")
+# number of videos processed concurrently (download/upload/poll overlap across videos)
+CONCURRENCY = int(os.getenv("CONCURRENCY", "5"))
+
+# audio format to transcode to with yt-dlp/ffmpeg (e.g. "mp3"). Empty (default) keeps the
+# native m4a/opus stream: AssemblyAI accepts it directly, so no re-encode, smaller uploads
+AUDIO_FORMAT = os.getenv("AUDIO_FORMAT", "")
 
 # detect which yt-dlp binary will be used (system or pip-installed)
 YT_DLP_PATH = shutil.which("yt-dlp")
@@ -66,7 +86,24 @@ MAX_BACKOFF = float(os.getenv("MAX_BACKOFF", "60"))
 # diarization config
 ENABLE_DIARIZATION = os.getenv("ENABLE_DIARIZATION", "1") in ("1", "true", "True")
 
+# keep the complete AssemblyAI response as zstd-compressed <id>_full_raw.json.zst next to the
+# slimmed raw transcript (which only holds what reconstruction reads)
+ARCHIVE_FULL_RAW = os.getenv("ARCHIVE_FULL_RAW", "1") in ("1", "true", "True")
+
+# webhook config: with a public WEBHOOK_URL (or USE_NGROK=1 to create one) AssemblyAI calls us
+# back on completion instead of us polling. Unset = plain polling.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8000"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "7200"))  # seconds before falling back to polling
+WEBHOOK_STARTUP_TIMEOUT = float(os.getenv("WEBHOOK_STARTUP_TIMEOUT", "10"))  # seconds for uvicorn to bind
+USE_NGROK = os.getenv("USE_NGROK", "0") in ("1", "true", "True")
+
+# transcript id -> asyncio.Event, set when the webhook reports the transcript is done
+WEBHOOK_EVENTS = {}
+
 
+@functools.lru_cache(maxsize=4096)
 def get_video_id(url: str) -> str:
     if "youtube" in url or "youtu.be" in url:
         parsed = urlparse(url)
@@ -80,32 +117,152 @@ def get_video_id(url: str) -> str:
     return url.rstrip("/\n").split("/")[-1]
 
 
-def download_audio(url: str) -> str:
+def flush_index(index: dict, force: bool = False) -> None:
+    """Persist `index` to INDEX_PATH, at most once per INDEX_FLUSH_INTERVAL unless `force`.
+
+    Intermediate states (downloading/uploading) are debounced; a debounced call
+    schedules a trailing write for when the window closes, so no state is held only
+    in memory. Resume-relevant checkpoints, completions and failures pass force=True.
+    Writes go to a temp file and are swapped in with os.replace so a crash never
+    leaves a truncated index behind.
+    """
+    global _last_index_flush, _index_flush_timer
+    now = time.monotonic()
+    if not force and now - _last_index_flush < INDEX_FLUSH_INTERVAL:
+        if _index_flush_timer is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                delay = INDEX_FLUSH_INTERVAL - (now - _last_index_flush)
+                _index_flush_timer = loop.call_later(delay, flush_index, index, True)
+        return
+    if _index_flush_timer is not None:
+        _index_flush_timer.cancel()
+        _index_flush_timer = None
+    tmp_path = INDEX_PATH.with_suffix(".json.tmp")
+    with open(tmp_path, "wb") as idxf:
+        idxf.write(orjson.dumps(index, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    os.replace(tmp_path, INDEX_PATH)
+    _last_index_flush = now
+
+
+def _webhook_event(tid: str) -> asyncio.Event:
+    ev = WEBHOOK_EVENTS.get(tid)
+    if ev is None:
+        ev = WEBHOOK_EVENTS[tid] = asyncio.Event()
+    return ev
+
+
+def start_webhook_server(loop: asyncio.AbstractEventLoop) -> bool:
+    """Serve `POST /aai-webhook` from a daemon thread.
+
+    Completion events are handed back to `loop` thread-safely; the waiting
+    coroutine then does a single GET for the final transcript. Returns False if
+    the server did not come up (e.g. the port is taken).
+    """
+    from fastapi import FastAPI, Request
+    import uvicorn
+
+    app = FastAPI()
+
+    @app.post("/aai-webhook")
+    async def aai_webhook(request: Request):
+        body = await request.json()
+        tid = body.get("transcript_id")
+        if tid:
+            logging.info("Webhook: transcript %s is %s", tid, body.get("status"))
+            loop.call_soon_threadsafe(lambda: _webhook_event(tid).set())
+        return {"ok": True}
+
+    server = uvicorn.Server(uvicorn.Config(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="aai-webhook", daemon=True)
+    thread.start()
+    # a bind failure only ends the thread, so wait until uvicorn reports it is serving
+    deadline = time.monotonic() + WEBHOOK_STARTUP_TIMEOUT
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            logging.error("Webhook receiver failed to start on %s:%d", WEBHOOK_HOST, WEBHOOK_PORT)
+            return False
+        time.sleep(0.05)
+    logging.info("Webhook receiver listening on %s:%d", WEBHOOK_HOST, WEBHOOK_PORT)
+    return True
+
+
+def start_ngrok_tunnel(port: int) -> str:
+    """Spawn `ngrok http <port>` and return its public https URL.
+
+    The URL is read from ngrok's local inspection API; raises RuntimeError if no
+    tunnel shows up.
+    """
+    proc = subprocess.Popen(["ngrok", "http", str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    atexit.register(proc.terminate)
+    for _ in range(30):
+        try:
+            with urllib.request.urlopen("http://127.0.0.1:4040/api/tunnels") as resp:
+                tunnels = orjson.loads(resp.read()).get("tunnels") or []
+            for t in tunnels:
+                if t.get("public_url", "").startswith("https://"):
+                    return t["public_url"]
+        except Exception:
+            pass
+        time.sleep(1)
+    raise RuntimeError("ngrok did not report a public URL")
+
+
+async def download_audio(url: str) -> tuple:
+    """Download audio for `url` and return `(audio_path, meta)`.
+
+    yt-dlp prints the video's info JSON while downloading, so metadata comes
+    from the same invocation instead of a separate `yt-dlp -J` run.
+    """
     vid = get_video_id(url) or "video"
     out_template = str(DOWNLOAD_DIR / f"{vid}.%(ext)s")
     # choose yt-dlp binary path if detected
     ytdlp_exec = YT_DLP_PATH or "yt-dlp"
+    if AUDIO_FORMAT:
+        fmt_args = ["-x", "--audio-format", AUDIO_FORMAT]
+    else:
+        fmt_args = ["-f", "bestaudio[ext=m4a]/bestaudio"]
     cmd = [
         ytdlp_exec,
-        "-x",
-        "--audio-format",
-        AUDIO_FORMAT,
+        *fmt_args,
+        "--dump-json",
+        "--no-simulate",
+        "--print",
+        "after_move:filepath",
         "-o",
         out_template,
         url,
     ]
-    logging.info("Downloading audio for %s (format=%s)", url, AUDIO_FORMAT)
+    logging.info("Downloading audio for %s (format=%s)", url, AUDIO_FORMAT or "native")
 
     attempt = 0
     while attempt < DOWNLOAD_RETRIES:
         try:
             attempt += 1
             logging.info("Download attempt %d/%d for %s", attempt, DOWNLOAD_RETRIES, url)
-            subprocess.run(cmd, check=True)
-            # find the produced file
-            for f in DOWNLOAD_DIR.iterdir():
-                if f.name.startswith(vid + "."):
-                    return str(f)
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await proc.communicate()
+            if proc.returncode != 0:
+                raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+            # stdout holds the info JSON line followed by the final (post-processed) file path
+            meta = {}
+            audio_path = None
+            for line in stdout.decode(errors="replace").splitlines():
+                if line.startswith("{"):
+                    meta = orjson.loads(line)
+                elif line.strip():
+                    audio_path = line.strip()
+            if audio_path and Path(audio_path).exists():
+                return audio_path, meta
+            # older yt-dlp without --print after_move: look the file up by name
+            found = next(DOWNLOAD_DIR.glob(f"{vid}.*"), None)
+            if found:
+                return str(found), meta
             raise FileNotFoundError("Downloaded file not found for video " + url)
         except Exception as exc:
             logging.warning("Download attempt %d failed for %s: %s", attempt, url, exc)
@@ -113,150 +270,377 @@ def download_audio(url: str) -> str:
                 raise
             sleep_t = RETRY_BACKOFF * (2 ** (attempt - 1))
             logging.info("Retrying download after %.1fs...", sleep_t)
-            time.sleep(sleep_t)
+            await asyncio.sleep(sleep_t)
 
 
 def fetch_channel_videos(channel_url: str) -> list:
     """Use yt-dlp to expand a channel /videos page into individual video URLs.
 
+    `-j` streams one JSON object per entry, so entries are parsed while yt-dlp is
+    still paging through the channel instead of buffering one huge document.
     Returns a list of full watch URLs.
     """
     logging.info("Fetching channel video list from %s", channel_url)
-    cmd = ["yt-dlp", "--flat-playlist", "-J", channel_url]
+    cmd = [YT_DLP_PATH or "yt-dlp", "--flat-playlist", "-j", channel_url]
+    urls = []
     try:
-        proc = subprocess.run(cmd, check=True, capture_output=True, text=True)
-    except subprocess.CalledProcessError as exc:
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True) as proc:
+            for line in proc.stdout:
+                if not line.strip():
+                    continue
+                try:
+                    e = orjson.loads(line)
+                except orjson.JSONDecodeError as exc:
+                    logging.error("Failed to parse yt-dlp output: %s", exc)
+                    continue
+                vid = e.get("id") or e.get("url")
+                if not vid:
+                    continue
+                # normalize to watch URL
+                if vid.startswith("http"):
+                    urls.append(vid)
+                else:
+                    urls.append(f"https://www.youtube.com/watch?v={vid}")
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, cmd)
+    except (OSError, subprocess.CalledProcessError) as exc:
         logging.error("yt-dlp failed to list channel: %s", exc)
         return []
-    try:
-        data = json.loads(proc.stdout)
-    except Exception as exc:
-        logging.error("Failed to parse yt-dlp output: %s", exc)
-        return []
-    entries = data.get("entries") or []
-    urls = []
-    for e in entries:
-        vid = e.get("id") or e.get("url")
-        if not vid:
-            continue
-        # normalize to watch URL
-        if vid.startswith("http"):
-            urls.append(vid)
-        else:
-            urls.append(f"https://www.youtube.com/watch?v={vid}")
     logging.info("Found %d videos on channel", len(urls))
     return urls
 
 
-def get_video_metadata(url: str) -> dict:
-    """Return metadata dict for a video URL using yt-dlp -J.
+def load_cached_video_metadata(vid: str, entry: dict) -> dict:
+    """Return already known metadata for a video without calling yt-dlp.
 
-    Returns a dict (may contain 'title', 'duration', etc.) or {} on failure.
+    An index `entry` that has title and duration is used as is; otherwise
+    `transcripts/<vid>/meta.json` (written by save_video_metadata) is read.
+    Returns {} when nothing is cached.
     """
-    ytdlp_exec = YT_DLP_PATH or "yt-dlp"
-    cmd = [ytdlp_exec, "-J", url]
-    try:
-        proc = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        data = json.loads(proc.stdout)
-        return data
-    except Exception as exc:
-        logging.warning("Failed to fetch metadata for %s: %s", url, exc)
+    if entry.get("title") and entry.get("duration"):
+        return entry
+    if not vid:
         return {}
+    meta_path = OUT_DIR / vid / "meta.json"
+    if meta_path.exists():
+        try:
+            with open(meta_path, "rb") as fh:
+                return orjson.loads(fh.read())
+        except Exception as exc:
+            logging.warning("Ignoring unreadable metadata cache %s: %s", meta_path, exc)
+    return {}
+
+
+def save_video_metadata(vid: str, meta: dict) -> None:
+    """Persist the fields load_cached_video_metadata uses to `transcripts/<vid>/meta.json`.
+
+    Only title and duration are kept: the full yt-dlp info dict is hundreds of KB and
+    its format/caption URLs are signed with the downloader's IP.
+    """
+    cached = {k: meta[k] for k in ("title", "duration") if meta.get(k)}
+    if not vid or not cached:
+        return
+    meta_path = OUT_DIR / vid / "meta.json"
+    meta_path.parent.mkdir(exist_ok=True)
+    with open(meta_path, "wb") as fh:
+        fh.write(orjson.dumps(cached))
+
+
+async def _with_retries(op, desc: str):
+    """Await `op()` up to UPLOAD_RETRIES times with exponential backoff.
+
+    Only transient failures are retried: connection errors, timeouts and HTTP
+    statuses in RETRY_STATUSES (the policy a urllib3 `Retry` would apply).
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            logging.debug("%s attempt %d/%d", desc, attempt, UPLOAD_RETRIES)
+            return await op()
+        except (aiohttp.ClientConnectionError, aiohttp.ClientResponseError, asyncio.TimeoutError) as exc:
+            logging.warning("%s attempt %d failed: %s", desc, attempt, exc)
+            if isinstance(exc, aiohttp.ClientResponseError) and exc.status not in RETRY_STATUSES:
+                raise
+            if attempt >= UPLOAD_RETRIES:
+                raise
+            sleep_t = RETRY_BACKOFF * (2 ** (attempt - 1))
+            logging.info("Retrying %s after %.1fs...", desc, sleep_t)
+            await asyncio.sleep(sleep_t)
+
+
+# the only utterance/word fields reconstruction reads (utterances also nest a per-word
+# `words` list, which is most of the payload)
+SEGMENT_FIELDS = ("speaker", "speaker_label", "text", "start", "end")
+
+
+def _slim_segments(items):
+    if not items:
+        return items
+    return [{k: item[k] for k in SEGMENT_FIELDS if k in item} for item in items]
 
 
-def transcribe_with_assemblyai(audio_path: str) -> dict:
+async def transcribe_with_assemblyai(audio_path: str, session: aiohttp.ClientSession, archive_path: Path = None) -> dict:
+    """Upload, create and wait for a transcript using the shared (pooled, authenticated) `session`.
+
+    The returned `raw` only keeps what `scripts/reconstruct_diarization.py` consumes:
+    utterances (or words when there are none) reduced to speaker/text/start/end, plus
+    audio_duration. If `archive_path` is given the complete response is written
+    there, zstd-compressed.
+    """
     logging.info("Transcribing %s with AssemblyAI REST API", audio_path)
 
-    def _upload_file(path: str) -> str:
+    async def _upload_file(path: str) -> str:
         upload_url = f"{API_BASE}/upload"
+        # stream the file object itself: aiohttp reads it off the event loop and the
+        # request carries a known Content-Length instead of chunked transfer encoding
+        headers = {"Content-Length": str(os.path.getsize(path))}
 
-        def _read_in_chunks(fh, chunk_size=5242880):
-            while True:
-                chunk = fh.read(chunk_size)
-                if not chunk:
-                    break
-                yield chunk
+        async def _op():
+            with open(path, "rb") as fh:
+                async with session.post(upload_url, headers=headers, data=fh) as resp:
+                    resp.raise_for_status()
+                    j = await resp.json()
+            return j.get("upload_url")
 
-        attempt = 0
-        while attempt < UPLOAD_RETRIES:
-            try:
-                attempt += 1
-                logging.info("Upload attempt %d/%d for %s", attempt, UPLOAD_RETRIES, path)
-                with open(path, "rb") as fh:
-                    resp = requests.post(upload_url, headers=HEADERS, data=_read_in_chunks(fh))
-                resp.raise_for_status()
-                return resp.json().get("upload_url")
-            except Exception as exc:
-                logging.warning("Upload attempt %d failed for %s: %s", attempt, path, exc)
-                if attempt >= UPLOAD_RETRIES:
-                    raise
-                sleep_t = RETRY_BACKOFF * (2 ** (attempt - 1))
-                logging.info("Retrying upload after %.1fs...", sleep_t)
-                time.sleep(sleep_t)
-
-    def _create_transcript(audio_url: str) -> str:
+        return await _with_retries(_op, f"upload of {path}")
+
+    async def _create_transcript(audio_url: str) -> str:
         endpoint = f"{API_BASE}/transcript"
         payload = {"audio_url": audio_url}
         # enable diarization/speaker labeling if requested
         if ENABLE_DIARIZATION:
             # AssemblyAI supports speaker labels; let the service auto-detect speaker count
             payload["speaker_labels"] = True
-        attempt = 0
-        while attempt < UPLOAD_RETRIES:
-            try:
-                attempt += 1
-                logging.info("Create transcript attempt %d/%d for %s", attempt, UPLOAD_RETRIES, audio_url)
-                resp = requests.post(endpoint, json=payload, headers=HEADERS)
+        if WEBHOOK_URL:
+            payload["webhook_url"] = WEBHOOK_URL
+
+        async def _op():
+            async with session.post(endpoint, json=payload) as resp:
                 resp.raise_for_status()
-                return resp.json().get("id")
-            except Exception as exc:
-                logging.warning("Create transcript attempt %d failed for %s: %s", attempt, audio_url, exc)
-                if attempt >= UPLOAD_RETRIES:
-                    raise
-                sleep_t = RETRY_BACKOFF * (2 ** (attempt - 1))
-                logging.info("Retrying create transcript after %.1fs...", sleep_t)
-                time.sleep(sleep_t)
-
-    def _poll_transcript(tid: str, interval: int = POLL_INTERVAL) -> dict:
+                j = await resp.json()
+            return j.get("id")
+
+        return await _with_retries(_op, f"create transcript for {audio_url}")
+
+    async def _poll_transcript(tid: str, interval: int = POLL_INTERVAL) -> dict:
         endpoint = f"{API_BASE}/transcript/{tid}"
+
+        async def _op():
+            async with session.get(endpoint) as resp:
+                resp.raise_for_status()
+                return await resp.json()
+
+        if WEBHOOK_URL:
+            # wait for the completion callback, then fetch the final JSON exactly once
+            try:
+                await asyncio.wait_for(_webhook_event(tid).wait(), WEBHOOK_TIMEOUT)
+            except asyncio.TimeoutError:
+                logging.warning("No webhook for %s after %.0fs, falling back to polling", tid, WEBHOOK_TIMEOUT)
+            else:
+                j = await _with_retries(_op, f"fetch of transcript {tid}")
+                if j.get("status") != "completed":
+                    raise RuntimeError(f"Transcription failed ({j.get('status')}): {j.get('error')}")
+                return j
+            finally:
+                WEBHOOK_EVENTS.pop(tid, None)
+
         attempt = 0
         sleep_time = interval
         while attempt < MAX_POLL_TRIES:
-            resp = requests.get(endpoint, headers=HEADERS)
-            resp.raise_for_status()
-            j = resp.json()
+            j = await _with_retries(_op, f"poll of transcript {tid}")
             status = j.get("status")
             if status == "completed":
                 return j
-            if status == "failed":
-                raise RuntimeError(f"Transcription failed: {j}")
+            # AssemblyAI reports terminal failures as "error"
+            if status in ("error", "failed"):
+                raise RuntimeError(f"Transcription failed ({status}): {j.get('error')}")
             # backoff before next poll
             attempt += 1
             sleep_time = min(interval * (BACKOFF_FACTOR ** attempt), MAX_BACKOFF)
             logging.debug("Poll attempt %d for %s, sleeping %.1fs", attempt, tid, sleep_time)
-            time.sleep(sleep_time)
+            await asyncio.sleep(sleep_time)
         raise RuntimeError(f"Max polling attempts ({MAX_POLL_TRIES}) exceeded for transcript {tid}")
 
-    upload_url = _upload_file(audio_path)
+    upload_url = await _upload_file(audio_path)
     if not upload_url:
         raise RuntimeError("Upload failed, no upload_url returned")
-    tid = _create_transcript(upload_url)
-    result = _poll_transcript(tid)
+    tid = await _create_transcript(upload_url)
+    result = await _poll_transcript(tid)
+    if archive_path:
+        archive_path.parent.mkdir(exist_ok=True)
+        with open(archive_path, "wb") as fh:
+            fh.write(zstd.ZstdCompressor(level=3).compress(orjson.dumps(result)))
+    utterances = result.get("utterances")
+    raw = {
+        "utterances": _slim_segments(utterances),
+        "words": _slim_segments(result.get("words")) if not utterances else None,
+        "audio_duration": result.get("audio_duration"),
+    }
     out = {
         "status": result.get("status"),
         "text": result.get("text"),
         "id": result.get("id"),
-        "raw": result,
+        "raw": raw,
     }
     return out
 
 
+async def run_pipeline(urls: list, index: dict) -> None:
+    """Download and transcribe `urls` concurrently (at most CONCURRENCY at a time).
+
+    Every stage is I/O bound (yt-dlp subprocess, upload, polling), so overlapping
+    videos cuts wall-clock time roughly by the concurrency factor.
+    """
+    global WEBHOOK_URL
+    index_lock = asyncio.Lock()
+    started = 0
+
+    async def save_index(force: bool = False):
+        async with index_lock:
+            flush_index(index, force=force)
+
+    # main() dedups `urls` by video id, so no two tasks here ever share a video
+    async def process_url(url: str, sem: asyncio.Semaphore, session: aiohttp.ClientSession):
+        nonlocal started
+        async with sem:
+            vid_key = None
+            try:
+                vid = get_video_id(url) or None
+                vid_key = vid or None
+                # if we already have a completed transcript, skip (before any yt-dlp call)
+                if vid_key and vid_key in index and index[vid_key].get("status") == "completed":
+                    logging.info("Skipping %s (already transcribed)", vid_key)
+                    return
+                # metadata (title, duration) from earlier runs; fresh metadata comes with the download
+                meta = load_cached_video_metadata(vid_key, index.get(vid_key or url, {}))
+                title = meta.get("title")
+                duration = meta.get("duration")
+
+                # initialize index entry
+                temp_key = vid_key or url
+                entry = index.get(temp_key, {})
+                if title:
+                    entry["title"] = title
+                if duration:
+                    entry["duration"] = duration
+                entry.setdefault("url", url)
+                entry.setdefault("created_at", datetime.utcnow().isoformat() + "Z")
+
+                # if already completed (and file exists), skip; if index says completed but file missing, re-run
+                if entry.get("status") == "completed" and entry.get("transcript_file") and Path(entry.get("transcript_file")).exists():
+                    logging.info("Skipping %s (already completed)", temp_key)
+                    return
+                elif entry.get("status") == "completed":
+                    logging.info("Transcript marked completed in index but file missing; will reprocess %s", temp_key)
+                    # clear completed status so we re-run
+                    entry.pop("status", None)
+                    entry.pop("transcript_file", None)
+
+                # reserve a slot against MAX_VIDEOS before doing any real work; with
+                # several videos in flight we count started videos, not finished ones
+                if MAX_VIDEOS and started >= MAX_VIDEOS:
+                    logging.debug("Reached MAX_VIDEOS=%d, skipping %s", MAX_VIDEOS, temp_key)
+                    return
+                started += 1
+
+                # DOWNLOAD STEP: only download if we don't already have audio_file
+                try:
+                    if entry.get("audio_file") and Path(entry.get("audio_file")).exists():
+                        audio = entry.get("audio_file")
+                        logging.info("Using existing audio file for %s: %s", temp_key, audio)
+                    else:
+                        entry["status"] = "downloading"
+                        index[temp_key] = entry
+                        await save_index()
+                        audio, meta = await download_audio(url)
+                        save_video_metadata(vid_key, meta)
+                        if meta.get("title"):
+                            entry["title"] = meta["title"]
+                        if meta.get("duration"):
+                            entry["duration"] = meta["duration"]
+                        entry["audio_file"] = str(audio)
+                        entry["status"] = "downloaded"
+                        # resume relies on audio_file being on disk, so don't debounce this one
+                        await save_index(force=True)
+                except Exception as exc:
+                    logging.exception("Download failed for %s: %s", url, exc)
+                    entry["status"] = "audio-download-failed"
+                    entry.setdefault("last_error", str(exc))
+                    index[temp_key] = entry
+                    await save_index(force=True)
+                    return
+
+                # TRANSCRIBE STEP: upload/create/poll. we retry the specific failing operations inside transcribe_with_assemblyai
+                try:
+                    entry["status"] = "uploading"
+                    index[temp_key] = entry
+                    await save_index()
+                    archive_path = None
+                    if ARCHIVE_FULL_RAW and vid_key:
+                        archive_path = OUT_DIR / vid_key / f"{vid_key}_full_raw.json.zst"
+                    out = await transcribe_with_assemblyai(audio, session, archive_path)
+                    # save raw transcript as a flat zstd-compressed file transcripts/<video_id>_raw.json.zst
+                    vid_name = (temp_key or out.get('id') or Path(audio).stem)
+                    raw_fname = f"{vid_name}_raw.json.zst"
+                    raw_path = OUT_DIR / raw_fname
+                    with open(raw_path, "wb") as of:
+                        of.write(zstd.ZstdCompressor(level=3).compress(orjson.dumps(out)))
+                    # conversation will be produced later by reconstruction step
+                    entry.setdefault("transcript_files", {})
+                    entry["transcript_files"]["raw"] = str(raw_path)
+                    entry["status"] = out.get("status") or "completed"
+                    entry["transcribed_at"] = datetime.utcnow().isoformat() + "Z"
+                    index[temp_key] = entry
+                    await save_index(force=True)
+                except Exception as exc:
+                    logging.exception("Transcription failed for %s: %s", url, exc)
+                    # determine likely failure stage from exception context? mark as transcript-failed
+                    entry["status"] = "transcript-failed"
+                    entry.setdefault("last_error", str(exc))
+                    index[temp_key] = entry
+                    await save_index(force=True)
+                    return
+            except Exception as exc:
+                logging.exception("Failed to process %s: %s", url, exc)
+                # mark as failed
+                try:
+                    entry = index.get(vid_key or url, {})
+                    entry["status"] = "failed"
+                    entry.setdefault("last_error", str(exc))
+                    index[vid_key or url] = entry
+                    await save_index(force=True)
+                except Exception:
+                    pass
+
+    if WEBHOOK_URL and not start_webhook_server(asyncio.get_running_loop()):
+        logging.warning("Falling back to polling for all transcripts")
+        WEBHOOK_URL = None
+
+    sem = asyncio.Semaphore(CONCURRENCY)
+    # one shared session so all tasks reuse pooled keep-alive connections (no TLS
+    # handshake per poll); no total timeout because uploads of long episodes can
+    # legitimately take minutes
+    timeout = aiohttp.ClientTimeout(total=None)
+    connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE)
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+        results = await asyncio.gather(*[process_url(u, sem, session) for u in urls], return_exceptions=True)
+    for url, res in zip(urls, results):
+        if isinstance(res, BaseException):
+            logging.error("Unhandled error processing %s: %s", url, res)
+
+
 def main():
+    global WEBHOOK_URL
+    if USE_NGROK and not WEBHOOK_URL:
+        WEBHOOK_URL = start_ngrok_tunnel(WEBHOOK_PORT) + "/aai-webhook"
+        logging.info("Using ngrok webhook URL %s", WEBHOOK_URL)
+
     # load or initialize index
     if INDEX_PATH.exists():
         try:
-            with open(INDEX_PATH, "r") as idxf:
-                index = json.load(idxf)
+            with open(INDEX_PATH, "rb") as idxf:
+                index = orjson.loads(idxf.read())
         except Exception:
             index = {}
     else:
@@ -271,17 +655,25 @@ def main():
         if p.is_dir():
             key = p.name
             entry = index.get(key, {})
-            entry.setdefault("transcript_path", str(p))
-            # detect raw transcript file inside
-            raw_files = list(p.glob(f"{key}_raw.json"))
+            # detect raw transcript file inside (a dir may only hold cached meta.json)
+            raw_files = list(p.glob(f"{key}_raw.json.zst")) + list(p.glob(f"{key}_raw.json"))
             conv_files = list(p.glob(f"{key}_conversation.json"))
             if raw_files:
+                entry.setdefault("transcript_path", str(p))
                 entry.setdefault("transcript_files", {})
                 entry["transcript_files"].setdefault("raw", str(raw_files[0]))
                 if conv_files:
                     entry["transcript_files"].setdefault("conversation", str(conv_files[0]))
                 entry["status"] = "completed"
             index[key] = entry
+        elif p.is_file() and p.name.endswith("_raw.json.zst"):
+            # compressed raw transcripts named <video_id>_raw.json.zst
+            key = p.name[: -len("_raw.json.zst")]
+            entry = index.get(key, {})
+            entry.setdefault("transcript_files", {})
+            entry["transcript_files"].setdefault("raw", str(p))
+            entry.setdefault("status", "completed")
+            index[key] = entry
         elif p.is_file() and p.suffix == ".json":
             # legacy flat json transcripts or raw transcripts named <video_id>_raw.json
             if p.name == INDEX_PATH.name:
@@ -302,130 +694,52 @@ def main():
                 entry.setdefault("url", entry.get("url", ""))
                 entry["status"] = "completed"
                 index[key] = entry
-    # persist any updates from the scan
-    with open(INDEX_PATH, "w") as idxf:
-        json.dump(index, idxf, indent=2)
-
-    with open(ROOT / "videos_list.json") as fh:
-        urls = json.load(fh)
-    # expand any channel /videos page entries using yt-dlp
+    # persist any updates from the scan; make sure the last debounced state lands on exit
+    flush_index(index, force=True)
+    atexit.register(lambda: flush_index(index, force=True))
+
+    with open(ROOT / "videos_list.json", "rb") as fh:
+        urls = orjson.loads(fh.read())
+    # expand any channel /videos page entries using yt-dlp; each listing is a blocking
+    # subprocess, so run them all at once in threads
+    channels = [u for u in urls if isinstance(u, str) and ("/videos" in u and ("@" in u or "/channel/" in u))]
+    channel_videos = {}
+    if channels:
+        with ThreadPoolExecutor(max_workers=len(channels)) as ex:
+            channel_videos = dict(zip(channels, ex.map(fetch_channel_videos, channels)))
     expanded = []
     for url in urls:
-        if isinstance(url, str) and ("/videos" in url and ("@" in url or "/channel/" in url)):
-            found = fetch_channel_videos(url)
+        if isinstance(url, str) and url in channel_videos:
+            found = channel_videos[url]
             if found:
                 expanded.extend(found)
             else:
                 logging.warning("No videos expanded for channel URL %s", url)
         else:
             expanded.append(url)
-    urls = expanded
-    # process sequentially, skipping completed
-    processed = 0
-    for url in urls:
-        if MAX_VIDEOS and processed >= MAX_VIDEOS:
-            logging.info("Reached MAX_VIDEOS=%d, stopping.", MAX_VIDEOS)
-            break
-        try:
-            vid = get_video_id(url) or None
-            vid_key = vid or None
-            # fetch metadata (title, duration) and store in index
-            meta = get_video_metadata(url)
-            title = meta.get("title")
-            duration = meta.get("duration")
-            # if we already have a completed transcript, skip
-            if vid_key and vid_key in index and index[vid_key].get("status") == "completed":
-                logging.info("Skipping %s (already transcribed)", vid_key)
-                continue
-
-            # initialize index entry
-            temp_key = vid_key or url
-            entry = index.get(temp_key, {})
-            if title:
-                entry["title"] = title
-            if duration:
-                entry["duration"] = duration
-            entry.setdefault("url", url)
-            entry.setdefault("created_at", datetime.utcnow().isoformat() + "Z")
-
-            # if already completed (and file exists), skip; if index says completed but file missing, re-run
-            if entry.get("status") == "completed" and entry.get("transcript_file") and Path(entry.get("transcript_file")).exists():
-                logging.info("Skipping %s (already completed)", temp_key)
-                processed += 1
-                continue
-            elif entry.get("status") == "completed":
-                logging.info("Transcript marked completed in index but file missing; will reprocess %s", temp_key)
-                # clear completed status so we re-run
-                entry.pop("status", None)
-                entry.pop("transcript_file", None)
-
-            # DOWNLOAD STEP: only download if we don't already have audio_file
-            try:
-                if entry.get("audio_file") and Path(entry.get("audio_file")).exists():
-                    audio = entry.get("audio_file")
-                    logging.info("Using existing audio file for %s: %s", temp_key, audio)
-                else:
-                    entry["status"] = "downloading"
-                    with open(INDEX_PATH, "w") as idxf:
-                        json.dump(index, idxf, indent=2)
-                    audio = download_audio(url)
-                    entry["audio_file"] = str(audio)
-                    entry["status"] = "downloaded"
-                    with open(INDEX_PATH, "w") as idxf:
-                        json.dump(index, idxf, indent=2)
-            except Exception as exc:
-                logging.exception("Download failed for %s: %s", url, exc)
-                entry["status"] = "audio-download-failed"
-                entry.setdefault("last_error", str(exc))
-                index[temp_key] = entry
-                with open(INDEX_PATH, "w") as idxf:
-                    json.dump(index, idxf, indent=2)
+    # drop duplicates (a channel plus videos from it, watch?v=X&t=.. vs youtu.be/X, overlapping
+    # channels) by video id, keeping the first URL for each; completed videos don't need a task.
+    # non-string entries are passed through so process_url reports them like any failure
+    seen = set()
+    urls = []
+    skipped = 0
+    for url in expanded:
+        if isinstance(url, str):
+            vid = get_video_id(url)
+            dedup_key = vid or url
+            if dedup_key in seen:
                 continue
-
-            # TRANSCRIBE STEP: upload/create/poll. we retry the specific failing operations inside transcribe_with_assemblyai
-            try:
-                entry["status"] = "uploading"
-                with open(INDEX_PATH, "w") as idxf:
-                    json.dump(index, idxf, indent=2)
-                out = transcribe_with_assemblyai(audio)
-                # save raw transcript as a flat file transcripts/<video_id>_raw.json
-                vid_name = (temp_key or out.get('id') or Path(audio).stem)
-                raw_fname = f"{vid_name}_raw.json"
-                raw_path = OUT_DIR / raw_fname
-                with open(raw_path, "w") as of:
-                    json.dump(out, of, indent=2)
-                # conversation will be produced later by reconstruction step
-                entry.setdefault("transcript_files", {})
-                entry["transcript_files"]["raw"] = str(raw_path)
-                entry["status"] = out.get("status") or "completed"
-                entry["transcribed_at"] = datetime.utcnow().isoformat() + "Z"
-                index[temp_key] = entry
-                with open(INDEX_PATH, "w") as idxf:
-                    json.dump(index, idxf, indent=2)
-            except Exception as exc:
-                logging.exception("Transcription failed for %s: %s", url, exc)
-                # determine likely failure stage from exception context? mark as transcript-failed
-                entry["status"] = "transcript-failed"
-                entry.setdefault("last_error", str(exc))
-                index[temp_key] = entry
-                with open(INDEX_PATH, "w") as idxf:
-                    json.dump(index, idxf, indent=2)
+            seen.add(dedup_key)
+            if vid and index.get(vid, {}).get("status") == "completed":
+                skipped += 1
                 continue
-            processed += 1
-        except Exception as exc:
-            logging.exception("Failed to process %s: %s", url, exc)
-            # mark as failed
-            try:
-                entry = index.get(vid_key or url, {})
-                entry["status"] = "failed"
-                entry.setdefault("last_error", str(exc))
-                index[vid_key or url] = entry
-                with open(INDEX_PATH, "w") as idxf:
-                    json.dump(index, idxf, indent=2)
-            except Exception:
-                pass
-    with open(OUT_DIR / "index.json", "w") as idxf:
-        json.dump(index, idxf, indent=2)
+        urls.append(url)
+    if skipped:
+        logging.info("Skipping %d already transcribed videos", skipped)
+    # process concurrently, skipping completed
+    logging.info("Processing %d videos with concurrency=%d", len(urls), CONCURRENCY)
+    asyncio.run(run_pipeline(urls, index))
+    flush_index(index, force=True)
     logging.info("Done. Transcripts in %s", OUT_DIR)
 
     # Note: reconstruction of conversation JSON is intentionally kept separate.